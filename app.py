@@ -1,8 +1,15 @@
+import getpass
+import hashlib
+import os
+import stat
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.arima.model import ARIMA
-import matplotlib.pyplot as plt
+import polars as pl
 
 # ---------------- PAGE CONFIG ----------------
 st.set_page_config(
@@ -11,6 +18,187 @@ st.set_page_config(
     layout="wide"
 )
 
+# ---------------- FORECAST HORIZON ----------------
+FORECAST_STEPS = 3
+FORECAST_LABELS = ["Next Month"] + [f"After {i} Months" for i in range(2, FORECAST_STEPS + 1)]
+
+# ---------------- CACHED CSV LOADER ----------------
+# parsed uploads are also kept on disk as Parquet, keyed on the file contents,
+# so re-uploading the same file after a restart skips the CSV parse
+MAX_CACHED_FILES = 50
+
+# the disk cache is trusted as the parse of a file, so only use a directory that
+# this user owns and nobody else can write to; anything else disables the cache
+def private_cache_dir():
+    try:
+        # getuser() raises when the uid has no passwd entry and no USER/LOGNAME,
+        # which is common in containers, so prefer the numeric uid
+        user = os.getuid() if hasattr(os, "getuid") else getpass.getuser()
+        cache_dir = Path(tempfile.gettempdir()) / f"sales-prediction-cache-{user}"
+        cache_dir.mkdir(mode=0o700, exist_ok=True)
+        info = cache_dir.lstat()
+    except (OSError, KeyError):
+        return None
+    if not stat.S_ISDIR(info.st_mode) or info.st_mode & 0o077:
+        return None
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        return None
+    return cache_dir
+
+# the disk cache is only an optimization: a failed write must not break the upload
+def write_parquet_cache(df, path, file_id):
+    # write then rename so a concurrent reader never sees a partial file
+    tmp_path = path.with_suffix(f".{file_id}.tmp")
+    try:
+        df.write_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+    except (OSError, pl.exceptions.ComputeError):
+        # Polars reports a full disk as ComputeError rather than OSError
+        tmp_path.unlink(missing_ok=True)
+        return
+    # keep only the most recently used files
+    try:
+        cached = sorted(path.parent.glob("*.parquet"), key=lambda p: p.stat().st_mtime)
+        for old in cached[:-MAX_CACHED_FILES]:
+            old.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+# keyed on the upload's file_id; the leading underscore stops Streamlit hashing the bytes.
+# every upload gets a new file_id, so entries expire rather than live for the whole process
+@st.cache_data(show_spinner=False, ttl=24*60*60, max_entries=100)
+def load_sales_csv(file_id: str, _raw_bytes: bytes):
+    cache_dir = private_cache_dir()
+    path = None
+    if cache_dir is not None:
+        path = cache_dir / f"{hashlib.sha256(_raw_bytes).hexdigest()}.parquet"
+    df = None
+    if path is not None and path.exists():
+        # another session may evict the file after the exists() check, or it may be
+        # corrupt; either way fall back to parsing the CSV
+        try:
+            df = pl.read_parquet(path)
+            # refresh the mtime so eviction drops the least recently used files first
+            os.utime(path)
+        except (OSError, pl.exceptions.PolarsError):
+            pass
+    if df is None:
+        df = pl.read_csv(_raw_bytes, schema_overrides={"Sales": pl.Float64})
+        if path is not None:
+            write_parquet_cache(df, path, file_id)
+    monthly, notes = monthly_totals(df)
+    return monthly["Sales"].to_numpy(), " ".join(notes), missing_sales(monthly)
+
+# sums daily/weekly rows into one row per month so ARIMA fits a monthly series;
+# files whose Month column is not all YYYY-MM / YYYY-MM-DD keep their row order.
+# Also returns notes on what was changed, to show next to the form.
+def monthly_totals(df):
+    if df.schema.get("Month") != pl.String:
+        return df, []
+    days = pl.col("Month").str.to_date("%Y-%m-%d", strict=False)
+    dates = pl.coalesce(pl.col("Month").str.to_date("%Y-%m", strict=False), days)
+    dated = df.with_columns(dates.alias("Date"), days.is_not_null().alias("HasDay"))
+    if dated["Date"].null_count():
+        return df, []
+
+    notes = []
+    totals = (
+        dated.group_by(pl.col("Date").dt.truncate("1mo").alias("Month"))
+        .agg(
+            # a month whose values are all missing stays missing rather than summing to 0
+            pl.when(pl.col("Sales").is_not_null().any())
+            .then(pl.col("Sales").sum())
+            .alias("Sales")
+        )
+        .sort("Month")
+    )
+    if dated.height > totals.height:
+        notes.append(f"Summed {dated.height} rows into {totals.height} monthly totals.")
+        # daily/weekly data that stops partway through its last month would make
+        # that month look like a sales drop: drop it if the next expected row
+        # (last date + typical spacing) would still fall inside that month.
+        # YYYY-MM values carry no day, and repeated months are not sub-monthly data.
+        unique_dates = dated["Date"].unique().sort()
+        step = unique_dates.diff().median()
+        last_date = unique_dates[-1]
+        month_end = unique_dates.tail(1).dt.month_end()[0]
+        if (
+            dated["HasDay"].all()
+            and step is not None
+            and step < timedelta(days=28)
+            and last_date + step <= month_end
+        ):
+            totals = totals.head(-1)
+            notes.append(
+                f"Dropped {last_date:%B %Y}, which the data only covers up to {last_date}."
+            )
+    if totals.height:
+        # months with no rows become missing values instead of being skipped,
+        # so the upload is rejected rather than joining non-adjacent months
+        totals = totals.upsample(time_column="Month", every="1mo")
+    return totals, notes
+
+# statsforecast does not skip NaN: one gap zeroes the fitted coefficients, so
+# missing sales are listed for the user instead of being passed to the model
+MAX_LISTED_MISSING = 10
+
+def missing_sales(df):
+    missing = df.with_row_index("Row", offset=1).filter(
+        pl.col("Sales").is_null() | pl.col("Sales").is_nan()
+    )
+    if df.schema.get("Month") == pl.Date:
+        labels = [f"{month:%B %Y}" for month in missing["Month"]]
+    elif df.schema.get("Month") == pl.String:
+        labels = [str(month) for month in missing["Month"]]
+    else:
+        labels = [f"row {row}" for row in missing["Row"]]
+    if len(labels) > MAX_LISTED_MISSING:
+        labels = labels[:MAX_LISTED_MISSING] + [f"{len(labels) - MAX_LISTED_MISSING} more"]
+    return labels
+
+# ---------------- CACHED MODEL ----------------
+# only the fit is cached; forecasting from a fitted model is cheap
+@st.cache_resource(show_spinner=False, ttl=24*60*60)
+def fit_arima(y_bytes: bytes, order):
+    # imported here: statsforecast pulls in numba and takes ~1.5s to import,
+    # which would otherwise delay the first page render
+    from statsforecast.models import ARIMA, AutoARIMA
+
+    # order=None lets AutoARIMA pick (p,d,q) itself
+    if order is None:
+        model = AutoARIMA(season_length=12)
+    else:
+        model = ARIMA(order=order)
+    return model.fit(y=np.frombuffer(y_bytes, dtype=np.float64))
+
+# ---------------- INCREMENTAL FORECAST ----------------
+# coefficients are only reused from fits on at least this many points ...
+MIN_POINTS_FOR_REUSE = 12
+# ... and only while the series has grown by at most this fraction since that fit
+MAX_GROWTH_WITHOUT_REFIT = 0.1
+
+def forecast_sales(sales_data, order):
+    # if the series only appends a few points to the one last fitted in this
+    # session, keep the estimated coefficients (and AutoARIMA's chosen order)
+    # and just re-run the filter. This means the same upload can give a
+    # slightly different forecast depending on what the session fitted before.
+    last_fit = st.session_state.get("last_fit")
+    if last_fit is not None:
+        fitted_y, fitted_order, model_fit = last_fit
+        n = len(fitted_y)
+        max_len = n + max(1, int(n * MAX_GROWTH_WITHOUT_REFIT))
+        if (
+            order == fitted_order
+            and n >= MIN_POINTS_FOR_REUSE
+            and n < len(sales_data) <= max_len
+            and np.array_equal(sales_data[:n], fitted_y)
+        ):
+            return model_fit.forward(y=sales_data, h=FORECAST_STEPS)["mean"]
+
+    model_fit = fit_arima(sales_data.tobytes(), order)
+    st.session_state.last_fit = (sales_data, order, model_fit)
+    return model_fit.predict(h=FORECAST_STEPS)["mean"]
+
 # ---------------- TITLE ----------------
 st.markdown(
     """
@@ -26,7 +214,7 @@ with st.expander("📌 CSV File Format (Important)"):
         """
         **Your CSV file must contain these columns:**
 
-        - `Month` (YYYY-MM or date)
+        - `Month` (YYYY-MM or date — daily or weekly rows are summed per month)
         - `Sales`
 
         **Example:**
@@ -39,73 +227,110 @@ with st.expander("📌 CSV File Format (Important)"):
         """
     )
 
-# ---------------- INPUT SECTION ----------------
-st.markdown("## ✍️ Enter Product & Sales Details")
+# ---------------- PREDICTION FRAGMENT ----------------
+# submitting the form reruns only this fragment, not the header above
+@st.fragment
+def prediction_section():
+    # ---------------- INPUT SECTION ----------------
+    with st.form("inputs"):
+        st.markdown("## ✍️ Enter Product & Sales Details")
 
-col1, col2 = st.columns(2)
+        col1, col2 = st.columns(2)
 
-with col1:
-    product_name = st.text_input("Product Name")
-    product_price = st.number_input("Product Price", min_value=0.0)
-    advertising_cost = st.number_input("Advertising Cost", min_value=0.0)
-    promotion_cost = st.number_input("Promotion Cost", min_value=0.0)
+        with col1:
+            product_name = st.text_input("Product Name")
+            product_price = st.number_input("Product Price", min_value=0.0)
+            advertising_cost = st.number_input("Advertising Cost", min_value=0.0)
+            promotion_cost = st.number_input("Promotion Cost", min_value=0.0)
 
-with col2:
-    st.markdown("### 📅 Enter Past 3 Months Sales")
-    m1 = st.number_input("Month 1 Sales", min_value=0.0)
-    m2 = st.number_input("Month 2 Sales", min_value=0.0)
-    m3 = st.number_input("Month 3 Sales", min_value=0.0)
+        with col2:
+            st.markdown("### 📅 Enter Past 3 Months Sales")
+            edited = st.data_editor(
+                pd.DataFrame({"Month": ["Month 1", "Month 2", "Month 3"], "Sales": [0.0] * 3}),
+                column_config={"Sales": st.column_config.NumberColumn(min_value=0.0)},
+                disabled=["Month"],
+                hide_index=True,
+                num_rows="fixed",
+                key="past_sales"
+            )
+            past_sales = edited["Sales"].to_numpy(dtype=np.float64)
+            auto_order = st.checkbox("Auto-select ARIMA order (AutoARIMA)")
 
-# ---------------- CSV UPLOAD (OPTIONAL) ----------------
-st.markdown("## 📂 OR Upload CSV File")
-uploaded_file = st.file_uploader("Upload CSV", type=["csv"])
+        # ---------------- CSV UPLOAD (OPTIONAL) ----------------
+        st.markdown("## 📂 OR Upload CSV File")
+        uploaded_file = st.file_uploader("Upload CSV", type=["csv"])
 
-# ---------------- DATA PREPARATION ----------------
-sales_data = None
+        submitted = st.form_submit_button("📈 Predict Future Sales")
 
-if uploaded_file:
-    df = pd.read_csv(uploaded_file)
-    sales_data = df["Sales"].values
-elif m1 > 0 and m2 > 0 and m3 > 0:
-    sales_data = np.array([m1, m2, m3])
+    # ---------------- DATA PREPARATION ----------------
+    sales_data = None
+    missing = []
 
-# ---------------- PREDICTION ----------------
-if st.button("📈 Predict Future Sales"):
+    if uploaded_file:
+        sales_data, load_notes, missing = load_sales_csv(uploaded_file.file_id, uploaded_file.getvalue())
+        if load_notes:
+            st.info(load_notes)
+    elif (past_sales > 0).all():
+        sales_data = past_sales
 
-    if sales_data is None or len(sales_data) < 3:
-        st.error("Please upload a CSV or enter past 3 months sales.")
-    else:
-        # ARIMA MODEL
-        model = ARIMA(sales_data, order=(1,1,1))
-        model_fit = model.fit()
-        forecast = model_fit.forecast(steps=3)
-
-        # ---------------- OUTPUT ----------------
-        st.markdown("## 📊 Prediction Results")
-
-        left, right = st.columns(2)
-
-        # -------- TABLE --------
-        with left:
-            result_df = pd.DataFrame({
-                "Month": ["Next Month", "After 2 Months", "After 3 Months"],
-                "Predicted Sales": forecast.round(2)
-            })
-            st.table(result_df)
-
-        # -------- CHART --------
-        with right:
-            plt.figure()
-            all_sales = np.concatenate([sales_data, forecast])
-            plt.plot(all_sales, marker="o")
-            plt.title("Sales Trend & Forecast")
-            plt.xlabel("Time")
-            plt.ylabel("Sales")
-            st.pyplot(plt)
-
-        # ---------------- SUMMARY ----------------
-        st.markdown("## 🧾 Product Summary")
-        st.write(f"**Product Name:** {product_name}")
-        st.write(f"**Product Price:** {product_price}")
-        st.write(f"**Advertising Cost:** {advertising_cost}")
-        st.write(f"**Promotion Cost:** {promotion_cost}")
+    # ---------------- PREDICTION ----------------
+    if submitted:
+
+        if missing:
+            st.error(f"Sales are missing for: {', '.join(missing)}. Please fill them in and upload the file again.")
+        elif sales_data is None or len(sales_data) < 3:
+            st.error("Please upload a CSV or enter past 3 months sales.")
+        else:
+            # ARIMA MODEL
+            order = None if auto_order else (1,1,1)
+            forecast = None
+            try:
+                forecast = forecast_sales(sales_data, order)
+            except ValueError:
+                # statsforecast's fixed-order ARIMA fails on some ordinary series
+                # (e.g. steady trends) where AutoARIMA still fits
+                if order is not None:
+                    st.warning("ARIMA(1,1,1) could not be fitted to this series; using AutoARIMA instead.")
+                    try:
+                        forecast = forecast_sales(sales_data, None)
+                    except ValueError:
+                        pass
+
+            if forecast is None:
+                st.error("Could not fit an ARIMA model to these sales. Please check the data and try again.")
+            else:
+                # ---------------- OUTPUT ----------------
+                st.markdown("## 📊 Prediction Results")
+
+                left, right = st.columns(2)
+
+                # -------- TABLE --------
+                with left:
+                    result_df = pd.DataFrame({
+                        "Month": FORECAST_LABELS,
+                        "Predicted Sales": forecast.round(2)
+                    })
+                    st.table(result_df)
+
+                # -------- CHART --------
+                with right:
+                    st.markdown("### Sales Trend & Forecast")
+                    n = len(sales_data)
+                    chart_df = pd.DataFrame(
+                        index=pd.RangeIndex(n + FORECAST_STEPS, name="Time"),
+                        columns=["Actual", "Forecast"],
+                        dtype=float
+                    )
+                    chart_df.iloc[:n, 0] = sales_data
+                    # start the forecast line at the last actual point so the two connect
+                    chart_df.iloc[n - 1:, 1] = np.append(sales_data[-1], forecast)
+                    st.line_chart(chart_df, x_label="Time", y_label="Sales")
+
+                # ---------------- SUMMARY ----------------
+                st.markdown("## 🧾 Product Summary")
+                st.write(f"**Product Name:** {product_name}")
+                st.write(f"**Product Price:** {product_price}")
+                st.write(f"**Advertising Cost:** {advertising_cost}")
+                st.write(f"**Promotion Cost:** {promotion_cost}")
+
+prediction_section()